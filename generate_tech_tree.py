@@ -5,14 +5,22 @@ Stellaris Dynamic Technology Tree Generator
 import re
 import configparser
 import sys
+import multiprocessing
 import os
+import fnmatch
+import json
+import traceback
 from pathlib import Path
+from array import array
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import ClassVar, Dict, List, Tuple
 from collections import Counter
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 
-@dataclass
+@dataclass(slots=True)
 class Technology:
     tech_id: str
     research_area: str = ""
@@ -22,15 +30,15 @@ class Technology:
     is_dangerous_tech: bool = False
     is_repeatable_tech: bool = False
     research_cost: str = ""
-    tech_categories: List[str] = field(default_factory=list)
-    unlock_conditions: List[str] = field(default_factory=list)
+
+    # 按ID直接视为危险科技的列表（类级常量，所有实例共享）
+    DANGEROUS_TECH_IDS: ClassVar[frozenset] = frozenset({
+        "tech_synthetic_workers", "tech_sapient_ai", "tech_positronic_ai",
+        "tech_mega_engineering", "tech_colossus", "tech_juggernaut"
+    })
     
     def __post_init__(self):
-        dangerous_tech_list = {
-            "tech_synthetic_workers", "tech_sapient_ai", "tech_positronic_ai",
-            "tech_mega_engineering", "tech_colossus", "tech_juggernaut"
-        }
-        self.is_dangerous_tech = self.tech_id in dangerous_tech_list
+        self.is_dangerous_tech = self.tech_id in self.DANGEROUS_TECH_IDS
         self.is_repeatable_tech = "repeatable" in self.tech_id
 
 
@@ -48,6 +56,11 @@ class TechTreeGenerator:
         "english": "l_english",
         "simp_chinese": "l_simp_chinese"
     }
+    # 同上，预先固定为 (语言代码, 文件头) 元组，遍历时不必每次生成 items 视图
+    SUPPORTED_LANGUAGE_ITEMS = tuple(SUPPORTED_LANGUAGES.items())
+    
+    # 各语言本地化文件名的匹配模式（与原 rglob 模式一致）
+    LOCALIZATION_FILE_PATTERNS = {lang_code: f"*{lang_key}*.yml" for lang_code, lang_key in SUPPORTED_LANGUAGE_ITEMS}
     
     # 少量UI文案（按语言）
     LOCALIZATION_STRINGS = {
@@ -71,32 +84,71 @@ class TechTreeGenerator:
     
     # 解析科技文件所用的核心正则：
     # - TECH_DEFINITION_REGEX：匹配 tech_id = { 的起始位置
-    # - 其余正则匹配常见键，如 prerequisites/cost/category/potential 等
+    # - TECH_BLOCK_FIELD_REGEX：一次扫描找出区块内所有常见键（area/tier/prerequisites/cost 等）的合法 "key = 值"；
+    #   键名放在分支开头，保持字面量前缀，避免多分支正则逐字符回溯；
+    #   取值放在以键命名的前瞻分组里，命中分支由 lastgroup 直接给出，且匹配只消耗到 "=" 后，继续扫描的位置与逐键匹配一致
     TECH_DEFINITION_REGEX = re.compile(r'(?m)^(\w+)\s*=\s*\{')
-    PREREQUISITES_REGEX = re.compile(r'prerequisites\s*=\s*\{')
-    COST_REGEX = re.compile(r'cost\s*=\s*([@\w\d]+)')
-    CATEGORY_REGEX = re.compile(r'category\s*=\s*\{')
-    POTENTIAL_REGEX = re.compile(r'(?:potential|starting_potential)\s*=\s*\{')
-    DANGEROUS_TECH_REGEX = re.compile(r'is_dangerous\s*=\s*yes')
-    REPEATABLE_TECH_REGEX = re.compile(r'is_repeatable\s*=\s*yes')
-    RESEARCH_AREA_REGEX = re.compile(r'area\s*=\s*(\w+)')
-    TIER_REGEX = re.compile(r'tier\s*=\s*(\d+)')
-    STARTING_TECH_REGEX = re.compile(r'start_tech\s*=\s*yes')
+    TECH_BLOCK_FIELD_REGEX = re.compile(
+        r'area\s*=\s*(?=(?P<area>\w+))'
+        r'|tier\s*=\s*(?=(?P<tier>\d+))'
+        r'|prerequisites\s*=\s*(?=(?P<prerequisites>\{))'
+        r'|cost\s*=\s*(?=(?P<cost>[@\w\d]+))'
+        r'|is_dangerous\s*=\s*(?=(?P<is_dangerous>yes))'
+        r'|is_repeatable\s*=\s*(?=(?P<is_repeatable>yes))'
+        r'|start_tech\s*=\s*(?=(?P<start_tech>yes))'
+    )
     TECH_ID_REGEX = re.compile(r'"([^"]+)"|(\w+)')
-    WORD_REGEX = re.compile(r'[\w_]+')
+    COMMENT_STRIP_REGEX = re.compile(r'#[^\n]*')
     
-    DESCRIPTION_LOCALIZATION_REGEX = re.compile(r'^\s*([a-zA-Z0-9_]+_desc):(?:\d+)?\s*"([^"]*(?:\\.[^"]*)*)"', re.IGNORECASE)
-    WHITESPACE_CLEANUP_REGEX = re.compile(r'\s+')
+    # 对整份文件做多行匹配：空白与引号内容都限制在单行内，等价于逐行 strip 后 match；注释行因以 # 开头不会匹配
+    DESCRIPTION_LOCALIZATION_REGEX = re.compile(r'^[^\S\n]*([a-zA-Z0-9_]+_desc):(?:\d+)?[^\S\n]*"([^"\n]*(?:\\.[^"\n]*)*)"', re.IGNORECASE | re.MULTILINE)
+    # 空白与转义的 \n、\t 视为同一类，连续出现时合并为一个空格
+    WHITESPACE_CLEANUP_REGEX = re.compile(r'(?:\s|\\[nt])+')
 
     def __init__(self, config_path: str):
         self.all_technologies: Dict[str, Technology] = {}
+        # 生成统计用的计数，在科技并入 all_technologies 时同步累计
+        self._count_dangerous = 0
+        self._count_repeatable = 0
+        self._area_counter: Counter = Counter()
+        self._tier_counter: Counter = Counter()
         self.base_game_tech_ids = set()
         self.tech_descriptions: Dict[str, Dict[str, str]] = {}
-        self.base_game_path, self.mod_folder_path, self.mod_filter_settings, self.localization_mod_list = self._load_configuration(config_path)
+        # 各语言已有描述的科技数，随 tech_descriptions 的写入同步累计
+        self._description_counts: Counter = Counter()
+        self._localization_file_cache: Dict[str, Dict[str, List[str]]] = {}
+
+        # 图遍历用的整数下标与并列数组（SoA），由 _build_graph_index 填充
+        self.indexed_tech_ids: List[str] = []
+        self.tech_index_of: Dict[str, int] = {}
+        self.successor_indices: List[List[int]] = []
+        self.tier_levels = array('i')
+        self.sorted_successor_indices: List[List[int]] = []
+        # successor_masks[i]：下标 i 的全部可达后继位集（超长或尚未计算时为 None），由 _precompute_overlong_trees 填充
+        self.successor_masks: List[int | None] = []
+        # 强连通分量（逆拓扑序），图结构不变时只求一次，供超长树统计与环检测共用
+        self._strongly_connected_components: List[List[int]] | None = None
+        # 已渲染子树片段缓存：(下标, 语言) -> 以该科技为第0层时其子树的各行
+        self._subtree_fragments: Dict[Tuple[int, str], List[str]] = {}
+        # 各语言下每个科技的子节点行（不含缩进）：语言 -> 按下标排列的 [(子节点下标, 行, 已展示时的行)]，首次展开时生成
+        self._child_entries: Dict[str, List[List[Tuple[int, str, str]] | None]] = {}
+        # tech_id -> 科技引用文本（与语言无关），建图时一次性生成
+        self.tech_refs: Dict[str, str] = {}
+
+        self.config_path = config_path
+        (self.base_game_path, self.mod_folder_path, self.mod_filter_settings,
+         self.localization_mod_list, self.verbose_cycles) = self._load_configuration(config_path)
         
         self.current_mod_folder_name = Path(__file__).parent.name
+        self._included_mod_ids = self._build_included_mod_ids()
+        self._localization_mod_ids = frozenset(self.localization_mod_list)
+        # 参与扫描的MOD目录在生成流程中首次用到时才列出（见 _ensure_mod_dir_lists）
+        self.mod_dirs_for_tech: Tuple[Path, ...] | None = None
+        self.mod_dirs_for_localization: Tuple[Path, ...] | None = None
 
         self.LONG_TREE_THRESHOLD = 100
+        # 待解析文件数达到该值时才启用多进程解析（进程池启动本身有固定开销）
+        self.PARALLEL_PARSE_MIN_FILES = 64
         self.overlong_tech_ids = set()
 
         
@@ -106,6 +158,7 @@ class TechTreeGenerator:
     # - MOD 根目录路径 mod_folder_path
     # - 可选的MOD过滤策略（白名单/黑名单/关闭）
     # - 可选的“汉化集中化”MOD列表（这些MOD的中文描述将不再从其它MOD重复读取）
+    # - 可选的报告设置：输出被重定向时是否仍逐条列出循环依赖
         config = configparser.ConfigParser()
         config.read(config_path, encoding='utf-8')
         
@@ -144,35 +197,52 @@ class TechTreeGenerator:
             if centralized_str:
                 localization_mod_list = [mod.strip() for mod in centralized_str.split(',') if mod.strip()]
         
-        return base_path, mod_path, mod_filter_settings, localization_mod_list
+        verbose_cycles = config.getboolean('report', 'verbose_cycles', fallback=False)
+        
+        return base_path, mod_path, mod_filter_settings, localization_mod_list, verbose_cycles
     
-    def _should_include_mod(self, mod_id: str) -> bool:
-    # 判定是否扫描某个MOD：
-    # - 当前生成器所在的MOD自身不参与扫描（避免自举干扰）
-    # - 启用过滤时，若配置了白名单，则仅白名单通过；否则若配置黑名单，则黑名单排除；都未配置则全部通过
-        if mod_id == self.current_mod_folder_name:
-            return False
-            
+    def _build_included_mod_ids(self):
+    # 过滤规则在构造时折算成一次：
+    # - 未启用过滤：返回 None，表示除当前生成器所在的MOD自身外全部通过（避免自举干扰）
+    # - 启用过滤：返回允许扫描的MOD集合 = 白名单 - 黑名单 - 自身；未配置白名单时集合为空
         if not self.mod_filter_settings['enable_filter']:
-            return True
-        
-        should_include = False
-        
-        if self.mod_filter_settings['included_mods']:
-            should_include = mod_id in self.mod_filter_settings['included_mods']
-        
-        if self.mod_filter_settings['ignored_mods']:
-            should_include = should_include and mod_id not in self.mod_filter_settings['ignored_mods']
-        
-        return should_include
+            return None
+        return frozenset(self.mod_filter_settings['included_mods']
+                         - self.mod_filter_settings['ignored_mods']
+                         - {self.current_mod_folder_name})
+
+    def _should_include_mod(self, mod_id: str) -> bool:
+    # 判定是否扫描某个MOD，规则见 _build_included_mod_ids
+        included_mod_ids = self._included_mod_ids
+        if included_mod_ids is None:
+            return mod_id != self.current_mod_folder_name
+        return mod_id in included_mod_ids
     
     def _should_scan_mod_localization(self, mod_id: str) -> bool:
     # 若某MOD在“汉化集中化”列表中，则不扫描其本地化
-        if mod_id in self.localization_mod_list:
+        if mod_id in self._localization_mod_ids:
             return False
             
         return self._should_include_mod(mod_id)
     
+    def _ensure_mod_dir_lists(self):
+    # 首次用到时才遍历MOD根目录（在生成流程的异常处理之内，目录不可读等错误照常报告），之后直接复用
+        if self.mod_dirs_for_tech is None:
+            self.mod_dirs_for_tech, self.mod_dirs_for_localization = self._build_mod_dir_lists()
+
+    def _build_mod_dir_lists(self) -> Tuple[Tuple[Path, ...], Tuple[Path, ...]]:
+    # 只遍历一次MOD根目录并套用过滤规则，之后的科技/英文/中文扫描直接复用结果（保持目录遍历顺序）：
+    # - 第一项：参与科技与英文描述扫描的MOD目录
+    # - 第二项：参与中文描述扫描的MOD目录（额外排除“汉化集中化”MOD）
+        mod_folder = Path(self.mod_folder_path)
+        if not mod_folder.exists():
+            return (), ()
+
+        mod_dirs = [mod_dir for mod_dir in mod_folder.iterdir() if mod_dir.is_dir()]
+        mod_dirs_for_tech = tuple(mod_dir for mod_dir in mod_dirs if self._should_include_mod(mod_dir.name))
+        mod_dirs_for_localization = tuple(mod_dir for mod_dir in mod_dirs if self._should_scan_mod_localization(mod_dir.name))
+        return mod_dirs_for_tech, mod_dirs_for_localization
+
     def _display_mod_filter_info(self):
         if self.mod_filter_settings['enable_filter']:
             print("MOD过滤: 已启用")
@@ -190,160 +260,187 @@ class TechTreeGenerator:
         
     def scan_all_technology_files(self):
     # 扫描顺序：先本体，再MOD；用于随后统计“本体/非本体”的科技数量
+    # 先按扫描顺序收集全部科技文件，批量解析后再依次合并，保持“先读到的定义优先”
         self._display_mod_filter_info()
+        self._ensure_mod_dir_lists()
         
-        self._scan_technology_path(Path(self.base_game_path) / "common" / "technology", "游戏本体科技文件")
+        base_files = self._list_tech_files(Path(self.base_game_path) / "common" / "technology")
+        mod_files = []
+        for mod_dir in self.mod_dirs_for_tech:
+            mod_files.extend(self._list_tech_files(mod_dir / "common" / "technology"))
+
+        parsed_files = self._map_files(TechTreeGenerator._parse_single_tech_file, base_files + mod_files)
+
+        for techs in parsed_files[:len(base_files)]:
+            self._merge_parsed_technologies(techs)
         self.base_game_tech_ids = set(self.all_technologies.keys())
-        
-        mod_folder = Path(self.mod_folder_path)
-        if mod_folder.exists():
-            scanned_count = 0
-            
-            for mod_dir in mod_folder.iterdir():
-                if mod_dir.is_dir():
-                    mod_id = mod_dir.name
-                    
-                    if self._should_include_mod(mod_id):
-                        mod_tech_path = mod_dir / "common" / "technology"
-                        if mod_tech_path.exists():
-                            new_techs = self._scan_technology_path(mod_tech_path, f"MOD科技文件 {mod_id}")
-                            if new_techs > 0:
-                                scanned_count += 1
-        
-    def _scan_technology_path(self, path: Path, description: str) -> int:
+
+        for techs in parsed_files[len(base_files):]:
+            self._merge_parsed_technologies(techs)
+
+    def _list_tech_files(self, path: Path) -> List[str]:
         if not path.exists():
-            return 0
-            
-        before_count = len(self.all_technologies)
-        
-        for file_path in path.glob("*.txt"):
+            return []
+        return [str(file_path) for file_path in path.glob("*.txt")]
+
+    def _map_files(self, parse_file, file_paths: List[str]) -> list:
+    # 对每个文件调用 parse_file，结果顺序与 file_paths 一致，由调用方按原扫描顺序合并。
+    # 文件较多时用进程池并行解析（parse_file 须为只依赖类属性的类方法，以便子进程按引用pickle）；
+    # 进程池启动有固定开销，文件少或进程池不可用时直接在当前进程顺序解析
+        if len(file_paths) >= self.PARALLEL_PARSE_MIN_FILES and (os.cpu_count() or 1) > 1:
             try:
-                self._parse_single_tech_file(file_path)
-            except Exception:
+                with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    return list(executor.map(parse_file, file_paths, chunksize=8))
+            except (OSError, BrokenProcessPool):
                 pass
-                
-        return len(self.all_technologies) - before_count
+        return [parse_file(file_path) for file_path in file_paths]
+
+    def _merge_parsed_technologies(self, techs: List[Technology]):
+    # 先到先得；每并入一个科技就更新统计计数，统计时无需再遍历全部科技。
+    # 科技ID与前置ID在主进程中驻留（子进程中驻留的字符串经pickle传回后不再是同一对象），
+    # 各处字典与列表共用同一字符串对象，查找时可直接按指针判等
+        for tech in techs:
+            if tech.tech_id not in self.all_technologies:
+                tech.tech_id = sys.intern(tech.tech_id)
+                tech.prerequisite_tech_ids = list(map(sys.intern, tech.prerequisite_tech_ids))
+                self.all_technologies[tech.tech_id] = tech
+                self._count_dangerous += tech.is_dangerous_tech
+                self._count_repeatable += tech.is_repeatable_tech
+                self._area_counter[tech.research_area or 'unknown'] += 1
+                self._tier_counter[tech.tier_level] += 1
                     
-    def _parse_single_tech_file(self, filepath: Path):
-    # 读取并去掉注释后，按“tech_id = { ... }”为单位切片，再解析每个区块
-        content = self._read_file_with_encoding(filepath)
-        if not content:
-            return
-            
-        content = self._remove_comments_from_content(content)
-        
-        for match in self.TECH_DEFINITION_REGEX.finditer(content):
-            tech_id = match.group(1)
-            tech_block = self._extract_braced_block(content, match.end())
+    @classmethod
+    def _parse_single_tech_file(cls, filepath: str) -> List[Technology]:
+    # 读取并去掉注释后，按“tech_id = { ... }”为单位切片，再解析每个区块；
+    # 返回按文件内顺序排列的科技，同一文件内的重复定义由合并时的“先到先得”处理。
+    # 解析出错时保留出错前已解析的科技
+        techs: List[Technology] = []
+        try:
+            content = cls._read_file_with_encoding(filepath)
+            if not content:
+                return techs
+                
+            content = cls._remove_comments_from_content(content)
             
-            if tech_block and tech_id not in self.all_technologies:
-                self.all_technologies[tech_id] = Technology(tech_id)
-                self._parse_tech_block_content(self.all_technologies[tech_id], tech_block)
+            for match in cls.TECH_DEFINITION_REGEX.finditer(content):
+                tech_block = cls._extract_braced_block(content, match.end())
+                
+                if tech_block:
+                    tech = Technology(match.group(1))
+                    techs.append(tech)
+                    cls._parse_tech_block_content(tech, tech_block)
+        except Exception:
+            pass
+        return techs
 
-    def _read_file_with_encoding(self, filepath: Path) -> str:
+    @classmethod
+    def _read_file_with_encoding(cls, filepath: str | Path) -> str:
+    # 按 fstat 得到的大小一次性读入全部字节，再统一解码（utf-8-sig 可兼容有无BOM，忽略非法字节）；
+    # 换行统一为 \n，与文本模式读取的结果一致
         try:
-            return filepath.read_text(encoding='utf-8-sig', errors='ignore')
-        except:
+            fd = os.open(filepath, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
             try:
-                return filepath.read_text(encoding='utf-8', errors='ignore')
-            except:
-                return ""
+                data = os.read(fd, os.fstat(fd).st_size)
+            finally:
+                os.close(fd)
+        except OSError:
+            return ""
 
-    def _remove_comments_from_content(self, content: str) -> str:
+        text = data.decode('utf-8-sig', errors='ignore')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+
+    @classmethod
+    def _remove_comments_from_content(cls, content: str) -> str:
     # Stellaris脚本以 # 为行内注释，此处粗略去除注释，保留注释前的内容
-        lines = []
-        for line in content.splitlines():
-            if line.lstrip().startswith('#'):
-                continue
-            if '#' in line:
-                line = line.split('#', 1)[0]
-            lines.append(line)
-        return '\n'.join(lines)
+    # 整行注释会留下空行，不影响后续按行首匹配科技定义与括号计数
+        return cls.COMMENT_STRIP_REGEX.sub('', content)
 
-    def _extract_braced_block(self, content: str, start_pos: int) -> str:
+    @classmethod
+    def _extract_braced_block(cls, content: str, start_pos: int) -> str:
     # 从 start_pos 开始，假设当前位置紧随一个“{”，使用括号深度计数法，查找与之匹配的“}”
     # 返回不包含首尾大括号的内部文本；若未能闭合（括号不匹配），返回空字符串
+    # 用 str.find 在C层直接跳到下一个“{”/“}”：每找到一个“}”，先把它之前的“{”计入深度再减一，
+    # 无嵌套的区块（最常见）只需两次查找
         brace_depth = 1
-        for i, char in enumerate(content[start_pos:], start_pos):
-            if char == '{':
+        search_pos = start_pos
+        next_open = content.find('{', start_pos)
+        while True:
+            next_close = content.find('}', search_pos)
+            if next_close == -1:
+                return ""
+            while next_open != -1 and next_open < next_close:
                 brace_depth += 1
-            elif char == '}':
-                brace_depth -= 1
-                if brace_depth == 0:
-                    return content[start_pos:i]
-        return ""
+                next_open = content.find('{', next_open + 1)
+            brace_depth -= 1
+            if brace_depth == 0:
+                return content[start_pos:next_close]
+            search_pos = next_close + 1
 
-    def _parse_tech_block_content(self, tech: Technology, content: str):
+    @classmethod
+    def _parse_tech_block_content(cls, tech: Technology, content: str):
     # 逐项解析科技区块内的键：
-    # - area / tier / prerequisites / cost / category / (starting_)potential
+    # - area / tier / prerequisites / cost
     # - is_dangerous / is_repeatable（也可以由ID或显式标记获得）
-        if area_match := self.RESEARCH_AREA_REGEX.search(content):
-            tech.research_area = area_match.group(1)
-        
-        if tier_match := self.TIER_REGEX.search(content):
-            tech.tier_level = int(tier_match.group(1))
-        
-        if m := self.PREREQUISITES_REGEX.search(content):
-            block = self._extract_braced_block(content, m.end())
-            tech_matches = self.TECH_ID_REGEX.findall(block)
-            tech.prerequisite_tech_ids = [m_id if m_id else w_id for m_id, w_id in tech_matches]
-        
-        if self.STARTING_TECH_REGEX.search(content):
+    # 每个键只取区块内第一次合法出现，与逐个 search 的语义保持一致
+        found_keys = set()
+        for field_match in cls.TECH_BLOCK_FIELD_REGEX.finditer(content):
+            key = field_match.lastgroup
+            if key in found_keys:
+                continue
+            found_keys.add(key)
+
+            if key == 'area':
+                tech.research_area = field_match.group('area')
+            elif key == 'tier':
+                tech.tier_level = int(field_match.group('tier'))
+            elif key == 'prerequisites':
+                block = cls._extract_braced_block(content, field_match.end('prerequisites'))
+                # TECH_ID_REGEX 每次只有一个分组命中（带引号或裸ID），另一个为空串
+                tech.prerequisite_tech_ids = [quoted_id or bare_id for quoted_id, bare_id in cls.TECH_ID_REGEX.findall(block)]
+            elif key == 'cost':
+                tech.research_cost = field_match.group('cost')
+            elif key == 'is_dangerous':
+                tech.is_dangerous_tech = True
+            elif key == 'is_repeatable':
+                tech.is_repeatable_tech = True
+
+        if 'start_tech' in found_keys:
             # 起始科技明确无前置
             tech.prerequisite_tech_ids = []
-            
-        if cost_match := self.COST_REGEX.search(content):
-            tech.research_cost = cost_match.group(1)
-            
-        if cat_m := self.CATEGORY_REGEX.search(content):
-            cat_block = self._extract_braced_block(content, cat_m.end())
-            tech.tech_categories = [c for c in self.WORD_REGEX.findall(cat_block)]
-            
-        if pot_m := self.POTENTIAL_REGEX.search(content):
-            pot_block = self._extract_braced_block(content, pot_m.end())
-            tech.unlock_conditions = [p for p in self.WORD_REGEX.findall(pot_block)]
-        
-        tech.is_dangerous_tech = tech.is_dangerous_tech or bool(self.DANGEROUS_TECH_REGEX.search(content))
-        tech.is_repeatable_tech = tech.is_repeatable_tech or bool(self.REPEATABLE_TECH_REGEX.search(content))
     
     def scan_all_tech_descriptions(self):
+        self._ensure_mod_dir_lists()
         self._scan_english_tech_descriptions()
         self._scan_chinese_tech_descriptions()
 
     def _scan_english_tech_descriptions(self):
     # 先从本体 localisation 提取英文描述，再扫描MOD；
     # 非本体的英文描述也会回填到中文缺省，以便至少有英文文案可用
+    # 先按扫描顺序收集文件，批量解析后依次合并（后读到的覆盖先读到的，与逐个解析一致）
+        file_sources = []
         base_localisation_path = Path(self.base_game_path) / "localisation"
         if base_localisation_path.exists():
-            files = list(base_localisation_path.rglob("*l_english*.yml"))
-            if files:
-                for yml_file in files:
-                    try:
-                        self._parse_english_description_file(yml_file, is_base_game=True)
-                    except Exception:
-                        pass
+            file_sources.extend((yml_file, True) for yml_file in self._list_localization_files(base_localisation_path)["english"])
         
-        mod_folder = Path(self.mod_folder_path)
-        if mod_folder.exists():
-            for mod_dir in mod_folder.iterdir():
-                if mod_dir.is_dir() and self._should_include_mod(mod_dir.name):
-                    mod_localisation_path = mod_dir / "localisation"
-                    if mod_localisation_path.exists():
-                        self._scan_mod_english_localization_files(mod_localisation_path)
+        for mod_dir in self.mod_dirs_for_tech:
+            mod_localisation_path = mod_dir / "localisation"
+            if mod_localisation_path.exists():
+                file_sources.extend((yml_file, False) for yml_file in self._list_localization_files(mod_localisation_path)["english"])
+
+        parsed_files = self._map_files(TechTreeGenerator._parse_description_file, [yml_file for yml_file, _ in file_sources])
+        for (_, is_base_game), entries in zip(file_sources, parsed_files):
+            self._apply_english_descriptions(entries, is_base_game)
 
     def _scan_chinese_tech_descriptions(self):
     # 中文描述的优先级：本体 -> 配置的集中汉化MOD -> 其余MOD（受过滤规则影响）
         found_chinese_descriptions = {}
+        yml_files = []
         
         base_localisation_path = Path(self.base_game_path) / "localisation"
         if base_localisation_path.exists():
-            files = list(base_localisation_path.rglob("*l_simp_chinese*.yml"))
-            if files:
-                for yml_file in files:
-                    try:
-                        self._parse_chinese_description_file(yml_file, found_chinese_descriptions)
-                    except Exception:
-                        pass
+            yml_files.extend(self._list_localization_files(base_localisation_path)["simp_chinese"])
         
         mod_folder = Path(self.mod_folder_path)
         if mod_folder.exists():
@@ -352,366 +449,512 @@ class TechTreeGenerator:
                     localization_mod_path = mod_folder / localization_mod_id
                     if localization_mod_path.exists():
                         if self._should_include_mod(localization_mod_id):
-                            self._scan_chinese_localization_files(localization_mod_path / "localisation", found_chinese_descriptions)
+                            yml_files.extend(self._list_chinese_localization_files(localization_mod_path / "localisation"))
                         else:
                             print(f"信息：汉化MOD已配置但被过滤规则排除: {localization_mod_id}")
                     else:
                         print(f"警告：配置的汉化MOD不存在: {localization_mod_id}")
 
-            for mod_dir in mod_folder.iterdir():
-                if mod_dir.is_dir() and self._should_scan_mod_localization(mod_dir.name):
-                    mod_localisation_path = mod_dir / "localisation"
-                    if mod_localisation_path.exists():
-                        self._scan_chinese_localization_files(mod_localisation_path, found_chinese_descriptions)
+            for mod_dir in self.mod_dirs_for_localization:
+                yml_files.extend(self._list_chinese_localization_files(mod_dir / "localisation"))
 
-    def _scan_mod_english_localization_files(self, localisation_path: Path):
-        try:
-            files = list(localisation_path.rglob("*l_english*.yml"))
-            if files:
-                for yml_file in files:
-                    try:
-                        self._parse_english_description_file(yml_file, is_base_game=False)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
+        for entries in self._map_files(TechTreeGenerator._parse_description_file, yml_files):
+            self._apply_chinese_descriptions(entries, found_chinese_descriptions)
 
-    def _scan_chinese_localization_files(self, localisation_path: Path, found_descriptions: dict) -> int:
-        if not localisation_path or not localisation_path.exists():
-            return 0
-            
-        found_count = 0
-        try:
-            chinese_files = list(localisation_path.rglob("*l_simp_chinese*.yml"))
-            for yml_file in chinese_files:
+    def _list_localization_files(self, localisation_path: Path) -> Dict[str, List[str]]:
+    # 用 os.scandir 手动先序遍历（顺序与 rglob 一致，不进入目录符号链接），
+    # 一次遍历同时收集所有受支持语言的 yml 文件路径；结果按目录缓存，英文/中文两轮扫描共用
+        cache_key = str(localisation_path)
+        cached_files = self._localization_file_cache.get(cache_key)
+        if cached_files is not None:
+            return cached_files
+
+        files: Dict[str, List[str]] = {lang_code: [] for lang_code in self.LOCALIZATION_FILE_PATTERNS}
+        pending_dirs = [cache_key]
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            try:
+                with os.scandir(directory) as scandir_it:
+                    entries = list(scandir_it)
+            except OSError:
+                continue
+
+            sub_dirs = []
+            for entry in entries:
                 try:
-                    found_count += self._parse_chinese_description_file(yml_file, found_descriptions)
-                except Exception:
-                    pass
-        except Exception:
-            pass
-        return found_count
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    sub_dirs.append(entry.path)
+                    continue
+                for lang_code, pattern in self.LOCALIZATION_FILE_PATTERNS.items():
+                    if fnmatch.fnmatch(entry.name, pattern):
+                        files[lang_code].append(entry.path)
+            pending_dirs.extend(reversed(sub_dirs))
+
+        self._localization_file_cache[cache_key] = files
+        return files
+
+    def _list_chinese_localization_files(self, localisation_path: Path) -> List[str]:
+        if not localisation_path.exists():
+            return []
+        return self._list_localization_files(localisation_path)["simp_chinese"]
 
-    def _parse_chinese_description_file(self, filepath: Path, found_descriptions: dict) -> int:
+    @classmethod
+    def _parse_description_file(cls, filepath: str) -> List[Tuple[str, str]]:
     # DESCRIPTION_LOCALIZATION_REGEX 只匹配 "xxx_desc:0 \"...\"" 形式；
-    # 对每行做轻量正则提取并清洗转义字符
-        content = self._read_file_with_encoding(filepath)
-        if not content:
-            return 0
-        
+    # 在整份文件上用 findall 一次扫描提取，返回按文件内顺序排列的 (tech_id, 原始描述)。
+    # 只依赖类属性，可在子进程中执行；是否属于已知科技、转义清洗都在合并时处理
+        try:
+            content = cls._read_file_with_encoding(filepath)
+            return [(desc_key.replace('_desc', ''), description)
+                    for desc_key, description in cls.DESCRIPTION_LOCALIZATION_REGEX.findall(content)]
+        except Exception:
+            return []
+
+    def _apply_chinese_descriptions(self, entries: List[Tuple[str, str]], found_descriptions: dict) -> int:
+    # 中文描述先到先得：已由更高优先级来源提供的科技不再覆盖
         found_count = 0
         
-        for line in content.splitlines():
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-                
-            match = self.DESCRIPTION_LOCALIZATION_REGEX.match(line)
-            if match:
-                desc_key = match.group(1)
-                description = self._clean_description_text(match.group(2))
-                tech_id = desc_key.replace('_desc', '')
-                
-                if (tech_id in self.all_technologies and tech_id not in found_descriptions):
-                    if tech_id not in self.tech_descriptions:
-                        self.tech_descriptions[tech_id] = {}
-                    
-                    self.tech_descriptions[tech_id]["simp_chinese"] = description
-                    found_descriptions[tech_id] = True
-                    found_count += 1
+        for tech_id, description in entries:
+            if (tech_id in self.all_technologies and tech_id not in found_descriptions):
+                self._set_tech_description(tech_id, "simp_chinese", self._clean_description_text(description))
+                found_descriptions[tech_id] = True
+                found_count += 1
         
         return found_count
 
-    def _parse_english_description_file(self, filepath: Path, is_base_game: bool):
+    def _apply_english_descriptions(self, entries: List[Tuple[str, str]], is_base_game: bool):
     # 英文描述与中文逻辑相似；若来自MOD（非本体），同时作为中文的兜底文本
-        content = self._read_file_with_encoding(filepath)
-        if not content:
-            return
-        
-        for line in content.splitlines():
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-                
-            match = self.DESCRIPTION_LOCALIZATION_REGEX.match(line)
-            if match:
-                desc_key = match.group(1)
-                description = self._clean_description_text(match.group(2))
-                tech_id = desc_key.replace('_desc', '')
-                
-                if tech_id in self.all_technologies:
-                    if tech_id not in self.tech_descriptions:
-                        self.tech_descriptions[tech_id] = {}
+        for tech_id, description in entries:
+            if tech_id in self.all_technologies:
+                description = self._clean_description_text(description)
+                self._set_tech_description(tech_id, "english", description)
+                if not is_base_game:
+                    self._set_tech_description(tech_id, "simp_chinese", description)
 
-                    if is_base_game:
-                        self.tech_descriptions[tech_id]["english"] = description
-                    else:
-                        self.tech_descriptions[tech_id]["english"] = description
-                        self.tech_descriptions[tech_id]["simp_chinese"] = description
+    def _set_tech_description(self, tech_id: str, lang_code: str, description: str):
+    # 写入某科技某语言的描述；首次出现该语言时计数，统计时无需再遍历 tech_descriptions
+        descriptions = self.tech_descriptions.setdefault(sys.intern(tech_id), {})
+        if lang_code not in descriptions:
+            self._description_counts[lang_code] += 1
+        descriptions[lang_code] = description
 
     def _clean_description_text(self, description: str) -> str:
     # 去除常见的转义与多余空白，保持单行
-        description = description.replace('\\"', '"').replace('\\n', ' ').replace('\\t', ' ')
-        return self.WHITESPACE_CLEANUP_REGEX.sub(' ', description).strip()
+        return self.WHITESPACE_CLEANUP_REGEX.sub(' ', description.replace('\\"', '"')).strip()
             
     def build_technology_tree_relationships(self):
     # 将“前置->后继”的引用补全：对每个科技A，其前置B们都追加 A 到 B.unlocked_tech_ids
-        for tech in self.all_technologies.values():
+    # 去重借助每个前置一份集合（首次用到时由已有列表初始化），每条边 O(1)；列表仍按首次出现顺序追加
+        techs = self.all_technologies
+        unlocked_id_sets: Dict[str, set] = {}
+        for tech in techs.values():
+            tech_id = tech.tech_id
             for prereq_id in tech.prerequisite_tech_ids:
-                if prereq_id in self.all_technologies:
-                    prereq_tech = self.all_technologies[prereq_id]
-                    if tech.tech_id not in prereq_tech.unlocked_tech_ids:
-                        prereq_tech.unlocked_tech_ids.append(tech.tech_id)
-
-    # 计算某科技的唯一可达后继科技数量
-    def _count_unique_successors(self, tech_id: str) -> int:
-    # 使用显式栈进行有向图的可达节点计数（去重），避免递归栈过深
-        if tech_id not in self.all_technologies:
-            return 0
-        visited = set()
-        stack = list(self.all_technologies[tech_id].unlocked_tech_ids)
-        while stack:
-            tid = stack.pop()
-            if tid in visited or tid not in self.all_technologies:
+                prereq_tech = techs.get(prereq_id)
+                if prereq_tech is None:
+                    continue
+                unlocked_ids = unlocked_id_sets.get(prereq_id)
+                if unlocked_ids is None:
+                    unlocked_ids = unlocked_id_sets[prereq_id] = set(prereq_tech.unlocked_tech_ids)
+                if tech_id not in unlocked_ids:
+                    unlocked_ids.add(tech_id)
+                    prereq_tech.unlocked_tech_ids.append(tech_id)
+        self._build_graph_index()
+
+    def _build_graph_index(self) -> None:
+    # 按扫描顺序为每个科技分配整数下标，并把遍历所需字段存为并列数组：
+    # successor_indices[i] 为后继下标列表，tier_levels[i] 为级别；
+    # 图遍历只做列表下标访问，输出文本时再经 indexed_tech_ids 换回 tech_id
+        self.indexed_tech_ids = list(self.all_technologies)
+        self.tech_index_of = {tid: i for i, tid in enumerate(self.indexed_tech_ids)}
+        index_of = self.tech_index_of
+        self.successor_indices = [
+            [index_of[unlock_id] for unlock_id in tech.unlocked_tech_ids if unlock_id in index_of]
+            for tech in self.all_technologies.values()
+        ]
+        # 用 map(attrgetter) 在C层取值，不经生成器帧
+        self.tier_levels = array('i', map(attrgetter('tier_level'), self.all_technologies.values()))
+
+        # sort_ranks[i]：下标 i 在全体科技按 (tier, tech_id) 排序中的名次；
+        # 据此为每个科技一次性排好子节点顺序（sorted_successor_indices），展开子树时直接使用，不再逐次排序。
+        # successor_indices 保持原始顺序，供环检测等按扫描顺序遍历
+        tech_ids = self.indexed_tech_ids
+        tier_levels = self.tier_levels
+        sort_ranks = array('i', [0]) * len(tech_ids)
+        for rank, index in enumerate(sorted(range(len(tech_ids)), key=lambda i: (tier_levels[i], tech_ids[i]))):
+            sort_ranks[index] = rank
+        self.sorted_successor_indices = [
+            sorted(unlocked, key=sort_ranks.__getitem__) for unlocked in self.successor_indices
+        ]
+        self.successor_masks = [None] * len(tech_ids)
+        self._strongly_connected_components = None
+        self._subtree_fragments.clear()
+        self._child_entries.clear()
+        self.tech_refs = {tech_id: self._format_tech_ref(tech) for tech_id, tech in self.all_technologies.items()}
+
+    def _find_strongly_connected_components(self) -> List[List[int]]:
+    # 迭代式 Tarjan 求强连通分量（显式栈，避免深链触发递归上限），整体 O(V+E)；
+    # 分量按“汇点在前”的逆拓扑序出栈：某分量出栈时，其所有后继分量都已出栈；
+    # 结果缓存到 _strongly_connected_components，直到下次重建图下标
+        if self._strongly_connected_components is not None:
+            return self._strongly_connected_components
+
+        successors = self.successor_indices
+        tech_count = len(successors)
+        order = [-1] * tech_count
+        lowlink = [0] * tech_count
+        on_stack = bytearray(tech_count)
+        scc_stack: List[int] = []
+        components: List[List[int]] = []
+        next_order = 0
+
+        for root in range(tech_count):
+            if order[root] != -1:
                 continue
-            visited.add(tid)
-            stack.extend(self.all_technologies[tid].unlocked_tech_ids)
-        return len(visited)
+            order[root] = lowlink[root] = next_order
+            next_order += 1
+            scc_stack.append(root)
+            on_stack[root] = 1
+            work = [(root, iter(successors[root]))]
+
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if order[child] == -1:
+                        order[child] = lowlink[child] = next_order
+                        next_order += 1
+                        scc_stack.append(child)
+                        on_stack[child] = 1
+                        work.append((child, iter(successors[child])))
+                        break
+                    if on_stack[child] and order[child] < lowlink[node]:
+                        lowlink[node] = order[child]
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if lowlink[node] < lowlink[parent]:
+                            lowlink[parent] = lowlink[node]
+                    if lowlink[node] != order[node]:
+                        continue
+
+                    component = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        self._strongly_connected_components = components
+        return components
+
+    # 计算各科技的唯一可达后继科技集合（位集）
+    def _compute_successor_masks(self) -> List[int | None]:
+    # 按逆拓扑序处理强连通分量，处理某分量时其所有后继分量的可达集合都已算好，可直接按位或合并（共享子树只算一次）。
+    # 同一分量内的科技互相可达，共享同一个位集；某后继已超过阈值时，前置必然也超过，不再保留其位集（记为 None）
+        successors = self.successor_indices
+        masks: List[int | None] = [0] * len(successors)
+
+        for component in self._find_strongly_connected_components():
+            mask = 0
+            for member in component:
+                for child in successors[member]:
+                    child_mask = masks[child]
+                    if child_mask is None:
+                        mask = None
+                        break
+                    mask |= (1 << child) | child_mask
+                if mask is None:
+                    break
+            if mask is not None and mask.bit_count() > self.LONG_TREE_THRESHOLD:
+                mask = None
+            for member in component:
+                masks[member] = mask
+        return masks
 
     # 预计算超长科技树集合
     def _precompute_overlong_trees(self) -> None:
     # 预先计算“后继科技数量”超过阈值的根节点，生成描述时直接给出提示，避免生成超长文本
         self.overlong_tech_ids.clear()
-        for tid in self.all_technologies.keys():
-            cnt = self._count_unique_successors(tid)
-            if cnt > self.LONG_TREE_THRESHOLD:
-                self.overlong_tech_ids.add(tid)
+        self.successor_masks = self._compute_successor_masks()
+        for index, mask in enumerate(self.successor_masks):
+            if mask is None:
+                self.overlong_tech_ids.add(self.indexed_tech_ids[index])
                         
-    def _format_tech_tree_entry(self, tech_id: str, indent_level: int = 1, current_prereq: str = None, lang_code: str = "simp_chinese") -> str:
-    # 将单个科技渲染为一行：包含层级缩进、领域图标、颜色以及“还需”其它并列前置的提示
-        if tech_id not in self.all_technologies:
-            return ""
-            
-        tech = self.all_technologies[tech_id]
-        indent = "    " * indent_level
-        
-        area_icon = self.RESEARCH_AREA_ICONS.get(tech.research_area, "")
-        
+    def _format_tech_ref(self, tech: Technology) -> str:
+    # 科技的可点击引用：(级别)['technology:ID', 领域图标§颜色$ID$§!]
+    # 颜色：危险科技为红(R)，5级及以上或可重复科技为紫(M)，其余为白(W)
         if tech.is_dangerous_tech:
-            formatted = f"({tech.tier_level})['technology:{tech_id}', {area_icon}§R${tech_id}$§!]"
+            color = "R"
         elif tech.tier_level >= 5 or tech.is_repeatable_tech:
-            formatted = f"({tech.tier_level})['technology:{tech_id}', {area_icon}§M${tech_id}$§!]"
+            color = "M"
         else:
-            formatted = f"({tech.tier_level})['technology:{tech_id}', {area_icon}§W${tech_id}$§!]"
-        
+            color = "W"
+        area_icon = self.RESEARCH_AREA_ICONS.get(tech.research_area, "")
+        return f"({tech.tier_level})['technology:{tech.tech_id}', {area_icon}§{color}${tech.tech_id}$§!]"
+
+    def _format_tech_tree_entry_body(self, tech_id: str, current_prereq: str | None, lang_code: str) -> str:
+    # 将单个科技渲染为一行（不含缩进）：领域图标、颜色以及“还需”其它并列前置的提示；
+    # 仅取决于 (tech_id, current_prereq, lang_code)，由 _child_entries_of 按边缓存；科技引用取自预先生成的 tech_refs
+        tech_refs = self.tech_refs
+        formatted = tech_refs.get(tech_id)
+        if formatted is None:
+            return ""
+            
+        tech = self.all_technologies[tech_id]
         additional_prereqs = []
         if current_prereq and len(tech.prerequisite_tech_ids) > 1:
-            for prereq_id in tech.prerequisite_tech_ids:
-                if prereq_id != current_prereq and prereq_id in self.all_technologies:
-                    prereq_tech = self.all_technologies[prereq_id]
-                    prereq_area_icon = self.RESEARCH_AREA_ICONS.get(prereq_tech.research_area, "")
-                    
-                    if prereq_tech.is_dangerous_tech:
-                        prereq_formatted = f"({prereq_tech.tier_level})['technology:{prereq_id}', {prereq_area_icon}§R${prereq_id}$§!]"
-                    elif prereq_tech.tier_level >= 5 or prereq_tech.is_repeatable_tech:
-                        prereq_formatted = f"({prereq_tech.tier_level})['technology:{prereq_id}', {prereq_area_icon}§M${prereq_id}$§!]"
-                    else:
-                        prereq_formatted = f"({prereq_tech.tier_level})['technology:{prereq_id}', {prereq_area_icon}§W${prereq_id}$§!]"
-                    
-                    additional_prereqs.append(prereq_formatted)
+            additional_prereqs = [tech_refs[prereq_id] for prereq_id in tech.prerequisite_tech_ids
+                                  if prereq_id != current_prereq and prereq_id in tech_refs]
         
-        entry = f"{indent}|--{formatted}"
+        entry = f"|--{formatted}"
         if additional_prereqs:
             prereq_text = " , ".join(additional_prereqs)
             requires_text = self.LOCALIZATION_STRINGS[lang_code]["requires"]
             entry += f" [§R{requires_text}§! {prereq_text}]"
         
         return entry
-        
-    def _build_tech_subtree(self, tech_id: str, current_depth: int = 0, parent_tech_id: str = None, lang_code: str = "simp_chinese", path_set: set | None = None, expanded_set: set | None = None) -> List[str]:
-    # - path_set: 当前DFS路径节点集合，用于检测环（避免 A->...->A）；
-    # - expanded_set: 从根开始已展开过子树的节点集合，避免同一节点在不同路径下重复展开；
-    #   对已展开节点，仅追加一行并标注“已在上方展示”。
-        if path_set is None:
-            path_set = set()
-        if expanded_set is None:
-            expanded_set = set()
-
-        if tech_id not in self.all_technologies:
-            return []
-
-        if tech_id in path_set:
-            return []
 
-        tech = self.all_technologies[tech_id]
-        lines: List[str] = []
-
-        path_set.add(tech_id)
+    def _child_entries_of(self, tech_index: int, lang_code: str) -> List[Tuple[int, str, str]]:
+    # 某科技的子节点行，已按 tier、tech_id 排好：(子节点下标, 行, 已展示时的行)，均不含缩进；
+    # 只依赖图结构与语言，每种语言下每条边只渲染一次，之后按下标直接取用
+        entries_by_index = self._child_entries.get(lang_code)
+        if entries_by_index is None:
+            entries_by_index = self._child_entries[lang_code] = [None] * len(self.indexed_tech_ids)
+        entries = entries_by_index[tech_index]
+        if entries is None:
+            tech_ids = self.indexed_tech_ids
+            tech_id = tech_ids[tech_index]
+            already_shown_text = self.LOCALIZATION_STRINGS[lang_code].get("already_shown", "already shown")
+            entries = []
+            for unlock_index in self.sorted_successor_indices[tech_index]:
+                entry_body = self._format_tech_tree_entry_body(tech_ids[unlock_index], tech_id, lang_code)
+                if entry_body:
+                    entries.append((unlock_index, entry_body, f"{entry_body} §g({already_shown_text})§!"))
+            entries_by_index[tech_index] = entries
+        return entries
+        
+    def _build_tech_subtree(self, tech_index: int, current_depth: int, lang_code: str, lines: List[str], path_set: int = 0, expanded_set: int = 0) -> int:
+    # 以整数下标遍历，把子树逐行追加到 lines，仅在渲染行时换回 tech_id：
+    # - path_set: 当前DFS路径节点的位集（第 i 位对应下标 i），用于检测环（避免 A->...->A）；按值传递，返回时自然“出栈”；
+    # - expanded_set: 从根开始已展开过子树的节点位集，避免同一节点在不同路径下重复展开；
+    #   对已展开节点，仅追加一行并标注“已在上方展示”。返回更新后的 expanded_set 供调用方继续使用。
+    # 子树复用：若某子节点的可达集合与 expanded_set|path_set 不相交，其子树渲染与“单独作为根”时完全一致，
+    # 且展开后其可达节点全部计入 expanded_set；此时直接套用缓存片段（仅调整缩进），否则照常展开
+        tech_bit = 1 << tech_index
+        if path_set & tech_bit:
+            return expanded_set
 
-        # 为了稳定与可读，按 tier 再按 tech_id 排序
-        unlocked_techs = sorted(tech.unlocked_tech_ids, key=lambda tid: (
-            self.all_technologies.get(tid, Technology(tid)).tier_level, tid
-        ))
+        path_set |= tech_bit
 
-        already_shown_text = self.LOCALIZATION_STRINGS[lang_code].get("already_shown", "already shown")
+        successor_masks = self.successor_masks
+        fragments = self._subtree_fragments
+        indent = "    " * (current_depth + 1)
 
-        for unlock_id in unlocked_techs:
-            base_line = self._format_tech_tree_entry(unlock_id, current_depth + 1, tech_id, lang_code)
-            if not base_line:
+        # 为了稳定与可读，按 tier 再按 tech_id 的顺序展开（已在建图时排好）
+        for unlock_index, entry_body, shown_entry in self._child_entries_of(tech_index, lang_code):
+            unlock_bit = 1 << unlock_index
+            if (expanded_set | path_set) & unlock_bit:
+                lines.append(indent + shown_entry)
                 continue
 
-            if (unlock_id in expanded_set) or (unlock_id in path_set):
-                lines.append(f"{base_line} §g({already_shown_text})§!")
-                continue
+            lines.append(indent + entry_body)
+            reach_mask = successor_masks[unlock_index]
+            reusable = reach_mask is not None and not (expanded_set | path_set) & reach_mask
+            expanded_set |= unlock_bit
+            if reusable:
+                fragment = fragments.get((unlock_index, lang_code))
+                if fragment is not None:
+                    lines.extend([indent + line for line in fragment])
+                    expanded_set |= reach_mask
+                    continue
+                fragment_start = len(lines)
 
-            lines.append(base_line)
-            expanded_set.add(unlock_id)
-            subtree_lines = self._build_tech_subtree(unlock_id, current_depth + 1, unlock_id, lang_code, path_set, expanded_set)
-            lines.extend(subtree_lines)
+            expanded_set = self._build_tech_subtree(unlock_index, current_depth + 1, lang_code, lines, path_set, expanded_set)
+            if reusable:
+                indent_width = len(indent)
+                fragments[(unlock_index, lang_code)] = [line[indent_width:] for line in lines[fragment_start:]]
 
-        path_set.remove(tech_id)
-        return lines
+        return expanded_set
         
     def generate_tech_tree_content(self, tech_id: str, lang_code: str = "simp_chinese") -> str:
         if tech_id not in self.all_technologies:
             return ""
+        parts: List[str] = []
+        self._append_tech_tree_content(tech_id, lang_code, parts)
+        return "".join(parts)
+
+    def _append_tech_tree_content(self, tech_id: str, lang_code: str, parts: List[str]):
+    # 把某个已知科技的树状文本分段追加到 parts，由调用方最后统一拼接，避免逐层拼出整段字符串再复制
+        header = "\\n\\n§H$technology_tree_title$§!"
 
         # 超长科技树：直接返回提示，避免将巨量后继全部展开导致游戏闪退
         if tech_id in self.overlong_tech_ids:
-            header = "\\n\\n§H$technology_tree_title$§!"
             skip_text = self.LOCALIZATION_STRINGS[lang_code]["skip_long_tree"]
-            return f"{header}\\n§R{skip_text}§!"
+            parts.append(f"{header}\\n§R{skip_text}§!")
+            return
 
-        tree_lines = self._build_tech_subtree(tech_id, current_depth=0, parent_tech_id=tech_id, lang_code=lang_code, path_set=set(), expanded_set=set())
+        # 作为根时的渲染即其子树片段本身，可被后续根或其它子树直接复用
+        fragment_key = (self.tech_index_of[tech_id], lang_code)
+        tree_lines = self._subtree_fragments.get(fragment_key)
+        if tree_lines is None:
+            tree_lines = []
+            self._build_tech_subtree(fragment_key[0], 0, lang_code, tree_lines)
+            self._subtree_fragments[fragment_key] = tree_lines
         if not tree_lines:
-            return "\\n\\n§H$technology_tree_title$§!\\n§Y$tech_tree_max_level$§!"
+            parts.append(f"{header}\\n§Y$tech_tree_max_level$§!")
+            return
             
-        header = "\\n\\n§H$technology_tree_title$§!"
-        content = header + "\\n" + "\\n".join(tree_lines)
-        return content
+        parts.append(header + "\\n")
+        parts.append("\\n".join(tree_lines))
         
-    def _get_output_file_paths(self, lang_code: str, filename: str) -> List[Path]:
-    # 将同一份localisation内容输出到多处路径，以兼容不同加载顺序策略
+    def _output_dirs(self, lang_code: str) -> List[Path]:
+    # 将同一份localisation内容输出到多个目录，以兼容不同加载顺序策略
         base = Path("output/localisation/")
-        paths = [
-            base / filename,
-            base / filename,
-            base / lang_code / filename,
-            base / "replace" / filename,
-            base / lang_code / "replace" / filename,
-            base / "zzz_tech_trees" / "replace" / filename,
+        return [
+            base,
+            base / lang_code,
+            base / "replace",
+            base / lang_code / "replace",
+            base / "zzz_tech_trees" / "replace",
         ]
-        for path in paths:
-            path.parent.mkdir(parents=True, exist_ok=True)
-        return paths
 
-    def _generate_localization_files_for_language(self, lang_code: str, lang_key: str):
-        self._generate_main_tech_tree_file(lang_code, lang_key)
-        self._generate_tech_description_replacement_file(lang_code, lang_key)
+    def _output_file_paths(self, lang_code: str, filename: str) -> List[Path]:
+    # 目录由 generate_all_yml_files 事先统一创建
+        return [output_dir / filename for output_dir in self._output_dirs(lang_code)]
+
+    def _write_output_files(self, file_paths: List[Path], content: str) -> bool:
+    # 只编码一次（utf-8-sig 带BOM，换行与文本模式写入一致），实际写入第一个可写路径；
+    # 其余镜像路径先删除旧文件再硬链接到该文件，文件系统不支持硬链接时退回直接写入同一份字节。
+    # 返回是否所有路径都已写入
+        payload = content.replace('\n', os.linesep).encode('utf-8-sig')
+        written_path = None
+        all_written = True
+        for file_path in file_paths:
+            try:
+                if written_path is not None:
+                    try:
+                        file_path.unlink(missing_ok=True)
+                        os.link(written_path, file_path)
+                        continue
+                    except OSError:
+                        pass
+                file_path.write_bytes(payload)
+                if written_path is None:
+                    written_path = file_path
+            except (OSError, PermissionError) as e:
+                print(f"警告：无法写入文件 {file_path}: {e}")
+                all_written = False
+        return all_written
+
+    def _generate_localization_files_for_language(self, lang_code: str, lang_key: str) -> bool:
+        main_written = self._generate_main_tech_tree_file(lang_code, lang_key)
+        replaced_written = self._generate_tech_description_replacement_file(lang_code, lang_key)
+        return main_written and replaced_written
 
-    def _generate_main_tech_tree_file(self, lang_code: str, lang_key: str):
+    def _generate_main_tech_tree_file(self, lang_code: str, lang_key: str) -> bool:
     # 为每个科技写入一条 _techtree 文本
-        file_paths = self._get_output_file_paths(lang_code, f"zztechtreemain_l_{lang_code}.yml")
+        file_paths = self._output_file_paths(lang_code, f"zztechtreemain_l_{lang_code}.yml")
         lang_config = self.LOCALIZATION_STRINGS[lang_code]
+        self._child_entries.pop(lang_code, None)
+        self._subtree_fragments.clear()
         
-        lines = [
-            f"{lang_key}:",
-            f' technology_tree_title:0 "{lang_config["title"]}"',
+        # 整个文件按片段写入同一个列表，最后只拼接一次（每个科技的树状文本不再单独成串后再复制）
+        parts = [
+            f"{lang_key}:\n",
+            f' technology_tree_title:0 "{lang_config["title"]}"\n',
             f' tech_tree_max_level:0 "{lang_config["top_level"]}"'
         ]
         
         for tech_id in sorted(self.all_technologies.keys()):
-            tree_content = self.generate_tech_tree_content(tech_id, lang_code)
-            if tree_content:
-                lines.append(f' {tech_id}_techtree:0 "{tree_content}"')
+            parts.append(f'\n {tech_id}_techtree:0 "')
+            self._append_tech_tree_content(tech_id, lang_code, parts)
+            parts.append('"')
         
-        content = '\n'.join(lines)
-        for file_path in file_paths:
-            try:
-                file_path.write_text(content, encoding='utf-8-sig')
-            except (OSError, PermissionError) as e:
-                print(f"警告：无法写入文件 {file_path}: {e}")
+        return self._write_output_files(file_paths, "".join(parts))
 
-    def _generate_tech_description_replacement_file(self, lang_code: str, lang_key: str):
+    def _generate_tech_description_replacement_file(self, lang_code: str, lang_key: str) -> bool:
     # 覆盖科技描述 _desc，将原描述（若有）+ 级别 + 树状内容 拼接；
     # 若缺失描述，不影响输出，仅统计缺失数量并提示
-        file_paths = self._get_output_file_paths(lang_code, f"zztechtreereplaced_l_{lang_code}.yml")
+        file_paths = self._output_file_paths(lang_code, f"zztechtreereplaced_l_{lang_code}.yml")
         lines = [f"{lang_key}:"]
         
-        missing_descriptions = []
-        lang_config = self.LOCALIZATION_STRINGS[lang_code]
+        # 语言相关的常量只取一次；缺失描述时 tech_desc 为空串，同一模板即得到“级别 + 树状内容”
+        tier_label = self.LOCALIZATION_STRINGS[lang_code]['tier_label']
+        tech_descriptions = self.tech_descriptions
+        no_descriptions: Dict[str, str] = {}
+        missing_count = 0
         
         for tech_id, tech in sorted(self.all_technologies.items()):
-            tech_desc = ""
-            if tech_id in self.tech_descriptions and lang_code in self.tech_descriptions[tech_id]:
-                tech_desc = self.tech_descriptions[tech_id][lang_code]
-            
+            tech_desc = tech_descriptions.get(tech_id, no_descriptions).get(lang_code, "")
             if not tech_desc:
-                missing_descriptions.append(tech_id)
-                tech_desc = ""
+                missing_count += 1
             
-            tree_content = f"${tech_id}_techtree$"
-            if tech_desc:
-                full_desc = f"{tech_desc}({lang_config['tier_label']}{tech.tier_level}){tree_content}"
-            else:
-                full_desc = f"({lang_config['tier_label']}{tech.tier_level}){tree_content}"
-            
-            lines.append(f' {tech_id}_desc:0 "{full_desc}"')
+            lines.append(f' {tech_id}_desc:0 "{tech_desc}({tier_label}{tech.tier_level})${tech_id}_techtree$"')
         
-        if missing_descriptions and len(missing_descriptions) > 0:
-            print(f"警告: {lang_code} 语言有 {len(missing_descriptions)} 个科技缺失描述")
+        if missing_count > 0:
+            print(f"警告: {lang_code} 语言有 {missing_count} 个科技缺失描述")
         
-        content = '\n'.join(lines)
-        for file_path in file_paths:
-            try:
-                file_path.write_text(content, encoding='utf-8-sig')
-            except (OSError, PermissionError) as e:
-                print(f"警告：无法写入文件 {file_path}: {e}")
+        return self._write_output_files(file_paths, '\n'.join(lines))
 
     def detect_circular_dependencies(self) -> List[List[str]]:
         """检测科技树中的循环依赖并返回所有循环路径"""
-    # 标准DFS
-    # - visited: 全局已访问节点，避免重复起点
-    # - rec_stack: 当前递归路径集合，遇到已在栈中的点即发现一条环
-    # - path: 为了输出路径，遇环时截取从首次出现到当前的片段
-        cycles = []
-        visited = set()
-        rec_stack = set()
-        
-        def dfs_detect_cycle(tech_id: str, path: List[str]) -> None:
-            if tech_id in rec_stack:
-                cycle_start = path.index(tech_id)
-                cycle = path[cycle_start:] + [tech_id]
-                cycles.append(cycle)
-                return
-            
-            if tech_id in visited or tech_id not in self.all_technologies:
-                return
-            
-            visited.add(tech_id)
-            rec_stack.add(tech_id)
-            path.append(tech_id)
-            
-            tech = self.all_technologies[tech_id]
-            for unlock_id in tech.unlocked_tech_ids:
-                dfs_detect_cycle(unlock_id, path.copy())
-            
-            rec_stack.remove(tech_id)
-            path.pop()
-        
-        for tech_id in self.all_technologies:
-            if tech_id not in visited:
-                dfs_detect_cycle(tech_id, [])
-        
-        return cycles
+    # 基于强连通分量（O(V+E)），不逐条枚举环：
+    # - 自指科技（A -> A）各报告一次；
+    # - 每个含多个科技的分量报告一条代表环：从分量内扫描顺序最靠前的科技出发，
+    #   在分量内做BFS找回到起点的最短路径；
+    # 按起点的扫描顺序输出，保证结果稳定
+        tech_ids = self.indexed_tech_ids
+        successors = self.successor_indices
+        found = []
+
+        for component in self._find_strongly_connected_components():
+            for member in component:
+                if member in successors[member]:
+                    found.append((member, [member, member]))
+            if len(component) == 1:
+                continue
+
+            members = set(component)
+            start = min(component)
+            parent = {start: start}
+            queue = [start]
+            closing = -1
+            for node in queue:
+                for child in successors[node]:
+                    if child == start and node != start:
+                        closing = node
+                        break
+                    if child in members and child not in parent:
+                        parent[child] = node
+                        queue.append(child)
+                if closing != -1:
+                    break
+
+            cycle = [start]
+            node = closing
+            while node != start:
+                cycle.append(node)
+                node = parent[node]
+            cycle.append(start)
+            cycle[1:-1] = cycle[-2:0:-1]
+            found.append((start, cycle))
+
+        found.sort(key=lambda item: item[0])
+        return [[tech_ids[i] for i in cycle] for _, cycle in found]
     
     def report_circular_dependencies(self) -> None:
         """检测并报告循环依赖"""
         print("正在检测科技循环依赖...")
         cycles = self.detect_circular_dependencies()
         
+        # 报告内容先收集成行，最后一次性输出（环很多时避免逐行 print）
         if cycles:
-            print(f"发现 {len(cycles)} 个循环依赖:")
+            report_lines = [f"发现 {len(cycles)} 个循环依赖:"]
             self_loops = []
             complex_cycles = []
             
@@ -723,28 +966,85 @@ class TechTreeGenerator:
                     # 复杂循环 (A -> B -> C -> A)
                     complex_cycles.append(cycle)
             
-            if self_loops:
-                print(f"  自循环科技 ({len(self_loops)}个):")
-                for tech in self_loops:
-                    print(f"    {tech} -> {tech}")
-            
-            if complex_cycles:
-                print(f"  复杂循环 ({len(complex_cycles)}个):")
-                for i, cycle in enumerate(complex_cycles, 1):
-                    cycle_str = " -> ".join(cycle)
-                    print(f"    循环 {i}: {cycle_str}")
-            print("")
+            # 输出被重定向（如批处理/CI记录到文件）时只给出数量，省去逐条格式化；交互运行或配置开启时照常列出
+            if not (sys.stdout.isatty() or self.verbose_cycles):
+                report_lines.append(f"  自循环科技 {len(self_loops)}个, 复杂循环 {len(complex_cycles)}个（未列出明细，可在 config.ini 的 [report] 中开启 verbose_cycles）")
+            else:
+                if self_loops:
+                    report_lines.append(f"  自循环科技 ({len(self_loops)}个):")
+                    report_lines.extend(f"    {tech} -> {tech}" for tech in self_loops)
+                
+                if complex_cycles:
+                    report_lines.append(f"  复杂循环 ({len(complex_cycles)}个):")
+                    for i, cycle in enumerate(complex_cycles, 1):
+                        cycle_str = " -> ".join(cycle)
+                        report_lines.append(f"    循环 {i}: {cycle_str}")
+            report_lines.append("")
+            print("\n".join(report_lines))
         else:
             print("未发现循环依赖。")
 
-    def generate_all_yml_files(self):
-        output_dir = Path("output/localisation")
-        output_dir.mkdir(parents=True, exist_ok=True)
+    def generate_all_yml_files(self) -> bool:
+    # 先一次性创建所有语言需要的输出目录（各语言共用的目录只创建一次），生成各文件时不再逐个检查；
+    # 返回是否所有输出文件都已写入
+        languages = self.SUPPORTED_LANGUAGE_ITEMS
+        for output_dir in dict.fromkeys(d for lang_code, _ in languages for d in self._output_dirs(lang_code)):
+            output_dir.mkdir(parents=True, exist_ok=True)
         
-        for lang_code, lang_key in self.SUPPORTED_LANGUAGES.items():
-            self._generate_localization_files_for_language(lang_code, lang_key)
+        all_written = True
+        for lang_code, lang_key in languages:
+            if not self._generate_localization_files_for_language(lang_code, lang_key):
+                all_written = False
+        return all_written
     
-    def run_generation_process(self):
+    def collect_input_fingerprint(self) -> List[list]:
+    # 生成所依赖的全部输入文件的 [路径, 修改时间(ns), 大小]：配置、生成器本身、科技文件与各 localisation 文件；
+    # 目录遍历结果会进入 _list_localization_files 的缓存，随后的正式扫描不再重复遍历
+        program_path = sys.executable if getattr(sys, 'frozen', False) else os.path.abspath(__file__)
+        input_files = [self.config_path, program_path]
+        self._ensure_mod_dir_lists()
+
+        input_files.extend(self._list_tech_files(Path(self.base_game_path) / "common" / "technology"))
+        for mod_dir in self.mod_dirs_for_tech:
+            input_files.extend(self._list_tech_files(mod_dir / "common" / "technology"))
+
+        localisation_dirs = [Path(self.base_game_path) / "localisation"]
+        localisation_dirs.extend(Path(self.mod_folder_path) / mod_id / "localisation" for mod_id in self.localization_mod_list)
+        localisation_dirs.extend(mod_dir / "localisation" for mod_dir in self.mod_dirs_for_tech + self.mod_dirs_for_localization)
+        for localisation_path in dict.fromkeys(localisation_dirs):
+            if localisation_path.exists():
+                for lang_files in self._list_localization_files(localisation_path).values():
+                    input_files.extend(lang_files)
+
+        fingerprint = []
+        for file_path in input_files:
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            fingerprint.append([str(file_path), file_stat.st_mtime_ns, file_stat.st_size])
+        return fingerprint
+
+    def is_output_up_to_date(self, cache_path: str, fingerprint: List[list]) -> bool:
+    # 上次成功生成时记录的输入与本次完全一致，且各语言的输出文件都在，才视为无需重新生成
+        for lang_code in self.SUPPORTED_LANGUAGES:
+            for filename in (f"zztechtreemain_l_{lang_code}.yml", f"zztechtreereplaced_l_{lang_code}.yml"):
+                if not all(path.exists() for path in self._output_file_paths(lang_code, filename)):
+                    return False
+        try:
+            cached_fingerprint = json.loads(Path(cache_path).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        return cached_fingerprint == fingerprint
+
+    def save_input_fingerprint(self, cache_path: str, fingerprint: List[list]):
+        try:
+            Path(cache_path).write_text(json.dumps(fingerprint, ensure_ascii=False), encoding='utf-8')
+        except OSError as e:
+            print(f"警告：无法写入缓存文件 {cache_path}: {e}")
+
+    def run_generation_process(self) -> bool:
+    # 返回是否生成成功；有输出文件写入失败时也视为失败，不记录输入指纹，下次运行会重新生成
         try:
             print("正在生成科技树MOD...")
             self.scan_all_technology_files()
@@ -757,41 +1057,49 @@ class TechTreeGenerator:
             self.report_circular_dependencies()
             
             self.display_generation_statistics()
-            self.generate_all_yml_files()
+            if not self.generate_all_yml_files():
+                print("部分输出文件写入失败，下次运行将重新生成。")
+                return False
             
             print("生成完成！")
+            return True
             
         except Exception as e:
             print(f"生成过程中出现错误: {e}")
-            import traceback
             traceback.print_exc()
+            return False
 
     def calculate_generation_statistics(self):
     # 基本计数统计：总数/本体/危险/循环科技/按领域/按级别等
+    # 各项计数已在 _merge_parsed_technologies 中随插入累计，这里直接读取
         stats = {
             'total': len(self.all_technologies),
             'base': len(self.base_game_tech_ids),
-            'dangerous': sum(1 for t in self.all_technologies.values() if t.is_dangerous_tech),
-            'repeatable': sum(1 for t in self.all_technologies.values() if t.is_repeatable_tech),
-            'per_area': dict(Counter(t.research_area or 'unknown' for t in self.all_technologies.values())),
-            'per_tier': dict(Counter(t.tier_level for t in self.all_technologies.values()))
+            'dangerous': self._count_dangerous,
+            'repeatable': self._count_repeatable,
+            'per_area': dict(self._area_counter),
+            'per_tier': dict(self._tier_counter)
         }
         stats['mod'] = stats['total'] - stats['base']
         return stats
 
     def display_generation_statistics(self):
         stats = self.calculate_generation_statistics()
-        print(f"\n生成统计:")
-        print(f"科技总数: {stats['total']} (本体: {stats['base']}, MOD: {stats['mod']})")
-        
-        english_count = sum(1 for descs in self.tech_descriptions.values() if "english" in descs)
-        chinese_count = sum(1 for descs in self.tech_descriptions.values() if "simp_chinese" in descs)
-        print(f"本地化: 英文 {english_count}个, 中文 {chinese_count}个")
+        english_count = self._description_counts["english"]
+        chinese_count = self._description_counts["simp_chinese"]
+        lines = [
+            f"\n生成统计:",
+            f"科技总数: {stats['total']} (本体: {stats['base']}, MOD: {stats['mod']})",
+            f"本地化: 英文 {english_count}个, 中文 {chinese_count}个",
+        ]
         if self.overlong_tech_ids:
-            print(f"超长科技树(>{self.LONG_TREE_THRESHOLD} 后续科技) 数量: {len(self.overlong_tech_ids)} —— 游戏内不予展示")
+            lines.append(f"超长科技树(>{self.LONG_TREE_THRESHOLD} 后续科技) 数量: {len(self.overlong_tech_ids)} —— 游戏内不予展示")
+        print("\n".join(lines))
 
 
 def main():
+    # 打包为exe后，多进程解析的子进程需要由此进入
+    multiprocessing.freeze_support()
     if getattr(sys, 'frozen', False):
         application_path = os.path.dirname(sys.executable)
     else:
@@ -807,7 +1115,19 @@ def main():
         return
         
     generator = TechTreeGenerator(config_path)
-    generator.run_generation_process()
+    # 输入文件自上次成功生成以来没有任何变化、且输出齐全时直接跳过
+    cache_path = os.path.join(application_path, ".mtime_cache")
+    # 检查输入时（含首次列出MOD目录）出现文件系统错误则视为有变化，照常生成且不记录指纹
+    try:
+        fingerprint = generator.collect_input_fingerprint()
+        up_to_date = generator.is_output_up_to_date(cache_path, fingerprint)
+    except OSError as e:
+        print(f"警告：无法检查输入文件是否有变化，将重新生成: {e}")
+        fingerprint, up_to_date = None, False
+    if up_to_date:
+        print("无变化，跳过生成")
+    elif generator.run_generation_process() and fingerprint is not None:
+        generator.save_input_fingerprint(cache_path, fingerprint)
     
     if getattr(sys, 'frozen', False):
         print("\n按 Enter 键退出。")